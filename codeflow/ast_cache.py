@@ -0,0 +1,90 @@
+from typing import Any, Callable, Optional
+from functools import cache
+from pathlib import Path
+import hashlib
+import pickle
+import shutil
+import sys
+import tempfile
+
+# Bump whenever the parser output changes for a reason outside the sources below
+PARSER_VERSION = 7
+CACHE_DIR = Path.home() / '.cache' / 'delta' / 'ast'
+# Any edit to these files can change the parse output or the pickled node layout
+_VERSIONED_SOURCES = (
+    Path(__file__).with_name('parser.py'),
+    Path(__file__).parent.parent / 'tree' / 'nodes.py',
+)
+
+def _cache_version() -> str:
+    digest = hashlib.sha1(str(PARSER_VERSION).encode())
+    for source in _VERSIONED_SOURCES:
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+@cache
+def _cache_dir() -> Optional[Path]:
+    """
+    Return the cache directory, wiping it if it was written by another parser version.
+
+    :return: The cache directory, or None if it can't be set up (e.g. a read-only home).
+    """
+    try:
+        version = _cache_version()
+        version_file = CACHE_DIR / 'version'
+        if version_file.is_file() and version_file.read_text() == version:
+            return CACHE_DIR
+
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        version_file.write_text(version)
+    except OSError:
+        return None
+    return CACHE_DIR
+
+def cached_parse(path: Path, parse_fn: Callable[[Path], Any]) -> Any:
+    """
+    Parse a file through an on-disk pickle cache.
+
+    Entries are keyed on the file's path, size and mtime, on the parse function
+    and on the running Python version, so any change to the file invalidates
+    its entry. Entries that fail to load count as misses, and when the cache
+    directory is unavailable the file is parsed without caching.
+
+    :param path: Path of the source file.
+    :param parse_fn: Called with the path on a cache miss to produce the result.
+    :return: The (possibly cached) result of parse_fn.
+    """
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        return parse_fn(path)
+
+    st = path.stat()
+    key = (
+        str(path.resolve()), st.st_size, st.st_mtime_ns,
+        parse_fn.__module__, parse_fn.__qualname__, sys.version_info[:2],
+    )
+    cache_file = cache_dir / f"{hashlib.sha1(repr(key).encode()).hexdigest()}.pkl"
+
+    try:
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        # Missing, truncated or stale (e.g. pickled by an older networkx) entry
+        pass
+
+    result = parse_fn(path)
+
+    # Write to a temporary file first so concurrent readers never see a partial entry
+    tmp_file = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tmp', delete=False) as f:
+            tmp_file = Path(f.name)
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_file.replace(cache_file)
+    except Exception:
+        # Failing to store an entry only costs the next parse a cache miss
+        if tmp_file is not None:
+            tmp_file.unlink(missing_ok=True)
+
+    return result
@@ -1,9 +1,14 @@
 from typing import Tuple, List
 from tree.graph_builder import LogicalNode, InstructionNode, LoopNode,BranchNode,WithNode,TryNode,ProgramNode
+from itertools import accumulate
 import ast
+import io
+import tokenize
 import networkx as nx
 
 class Scope():
+    __slots__ = ('level', 'nodes')
+
     def __init__(self, level: int = 1) -> None:
         self.level = level
         self.nodes: List[LogicalNode] = []
@@ -13,34 +18,102 @@ class Scope():
 
 class CodeFlowParser(ast.NodeVisitor):
     def __init__(self):
+        self._reset()
+        self._dispatch = {
+            ast.Module: self.visit_Module,
+            ast.Expr: self.visit_Expr,
+            ast.Assign: self.visit_Assign,
+            ast.AugAssign: self.visit_AugAssign,
+            ast.If: self.visit_If,
+            ast.For: self.visit_For,
+            ast.While: self.visit_While,
+            ast.Try: self.visit_Try,
+            ast.With: self.visit_With,
+            ast.Return: self.visit_Return,
+            ast.Break: self.visit_Break,
+            ast.Continue: self.visit_Continue,
+            ast.Pass: self.visit_Pass,
+            ast.FunctionDef: self.visit_FunctionDef,
+        }
+
+    def _reset(self) -> None:
+        """
+        Start a fresh parse state so one parser can be reused across files.
+        """
         self.scopes: list[Scope] = [Scope()]
         self.graph = nx.DiGraph()
         self.graph_labels = {}
+        self._graph_edges: list[tuple[LogicalNode, LogicalNode]] = []
+        self._node_text_cache: dict[int, str] = {}
+        self._source = b''
+        self._line_starts: list[int] = [0]
 
-    def parse(self, source_code: str) -> Tuple[ProgramNode,nx.DiGraph,dict]:
+    def parse(self, source_code: str | bytes) -> Tuple[ProgramNode,nx.DiGraph,dict]:
         """
         Parse the source code and build the logic flow graph.
         
-        :param source_code: The Python source code as a string.
+        :param source_code: The Python source code as a string or raw bytes.
         :return: The starting LogicalNode of the graph.
         """
+        self._reset()
         tree = ast.parse(source_code)
-        self.visit(tree)
+        self._load_source(source_code)
+        try:
+            self.visit(tree)
+        except Exception as e:
+            # Locate the failing node only once something has actually raised
+            node = self._find_failed_node(e.__traceback__)
+            e.add_note(f"Error at line {getattr(node, 'lineno', '?')}, col {getattr(node, 'col_offset', '?')}")
+            raise
+        finally:
+            self._node_text_cache.clear()
+            self._source = b''
+            self._line_starts = [0]
+
+        self.graph.add_edges_from(self._graph_edges)
+        self._graph_edges.clear()
         
         program_node = ProgramNode()
         program_node.children = self.scopes[0].nodes
 
         return program_node, self.graph,self.graph_labels
 
+    def _load_source(self, source_code: str | bytes) -> None:
+        """
+        Keep the source as UTF-8 bytes along with the byte offset of every line start.
+
+        AST column offsets are UTF-8 byte offsets, so a node's source text is a plain
+        slice of these bytes.
+        """
+        if isinstance(source_code, str):
+            source = source_code.encode('utf-8')
+        else:
+            encoding, _ = tokenize.detect_encoding(io.BytesIO(source_code).readline)
+            source = source_code if encoding == 'utf-8' else source_code.decode(encoding).encode('utf-8')
+
+        self._source = source
+        self._line_starts = [0, *accumulate(map(len, source.splitlines(keepends=True)))]
+
     def _stringifyNode(self, node: ast.AST) -> str:
-        return ast.unparse(node).strip()
+        s = self._node_text_cache.get(id(node))
+        if s is None:
+            lineno = getattr(node, 'lineno', None)
+            if lineno is not None and node.end_lineno == lineno:
+                start = self._line_starts[lineno - 1]
+                s = self._source[start + node.col_offset:start + node.end_col_offset].decode('utf-8').strip()
+            else:
+                # Nodes such as withitem carry no source positions, and multi-line
+                # slices would bring line breaks, indentation and comments into keys
+                s = ast.unparse(node).strip()
+            self._node_text_cache[id(node)] = s
+        return s
 
     def _add_node_to_scope(self,node: LogicalNode):
         scope = self.scopes[-1]
         scope.nodes.append(node)  
 
     def _add_node_to_graph(self,origin: LogicalNode, dest: LogicalNode, label: str = None):
-        self.graph.add_edge(origin,dest)
+        self._graph_edges.append((origin,dest))
 
         if label is not None:
             self.graph_labels[(origin,dest)] = label
@@ -165,7 +238,7 @@ class CodeFlowParser(ast.NodeVisitor):
         self.scopes.append(Scope(self.scopes[-1].level+1))
         self.generic_visit(node,'body')
         scope = self.scopes.pop()
-        loop_node.add_children(*scope.nodes)
+        loop_node.add_children_list(scope.nodes)
         # self._add_node_to_graph(loop_node,scope.nodes,"loop body")
 
     def visit_While(self, node: ast.While):
@@ -184,7 +257,7 @@ class CodeFlowParser(ast.NodeVisitor):
         self.scopes.append(Scope(self.scopes[-1].level+1))
         self.generic_visit(node,'body')
         scope = self.scopes.pop()
-        loop_node.add_children(*scope.nodes)
+        loop_node.add_children_list(scope.nodes)
         # self._add_node_to_graph(loop_node,scope.nodes,"loop body")
 
     def visit_FunctionDef(self, node: ast.FunctionDef):
@@ -320,16 +393,24 @@ class CodeFlowParser(ast.NodeVisitor):
         self.scopes.append(Scope(self.scopes[-1].level+1))
         self.generic_visit(node, 'body')
         scope = self.scopes.pop()
-        with_node.add_children(*scope.nodes)
+        with_node.add_children_list(scope.nodes)
             
         self.last_node = with_node
 
     def visit(self, node):
         """
-        Override visit to handle exceptions and provide error details.
+        Override visit to dispatch through the precomputed visitor table.
         """
-        try:
-            super().visit(node)
-        except Exception as e:
-            msg = f"Error at line {getattr(node, 'lineno', '?')}, col {getattr(node, 'col_offset', '?')}: {str(e)}"
-            raise Exception(msg)
\ No newline at end of file
+        self._dispatch.get(type(node), self.generic_visit)(node)
+
+    def _find_failed_node(self, tb) -> ast.AST | None:
+        """
+        Walk a traceback and return the innermost AST node being visited.
+        """
+        failed_node = None
+        while tb is not None:
+            node = tb.tb_frame.f_locals.get('node')
+            if isinstance(node, ast.AST) and hasattr(node, 'lineno'):
+                failed_node = node
+            tb = tb.tb_next
+        return failed_node
\ No newline at end of file
@@ -1,12 +1,11 @@
 import networkx as nx
-from networkx.drawing.nx_pydot import graphviz_layout
-import matplotlib.pyplot as plt
 from typing import Tuple
 import codeflow.parser as parser
-from tree.nodes import ProgramNode,LogicalNode,InstructionNode,LoopNode,BranchNode,WithNode,TryNode
-from tree.graph_builder import build_graph
+from codeflow.ast_cache import cached_parse
+from tree.nodes import ProgramNode,LogicalNode
+from tree.graph_builder import build_graph, build_json, walk
 from pathlib import Path
-from json import dump
+from json import dumps
 
 class Maggigy:
     def __init__(self) -> None:
@@ -21,65 +20,27 @@ class Maggigy:
         elif path_object.suffix != '.py':
             raise Exception(f"File '{path_object.absolute}' is not a .py file")
         
-        with open(file_path,'r') as f:
-            return self._logic_parser.parse(f.read())
+        return cached_parse(path_object, self._parse_path)
+
+    def _parse_path(self, path: Path) -> Tuple[ProgramNode,nx.DiGraph,dict]:
+        return self._logic_parser.parse(path.read_bytes())
     
     def build_json(self, node: LogicalNode):
-        match node:
-            case InstructionNode():
-                return {
-                    'type': 'instruction',
-                    'value': node.key
-                }
-            case LoopNode():
-                children = []
-
-                for child in node.children:
-                    children.append(self.build_json(child))
-                return {
-                    'type': 'loop',
-                    'value': {node.key : children}
-                }
-            case BranchNode():
-                return {
-                    'type': 'branch',
-                    'value': {
-                        condition: [self.build_json(child) for child in children]
-                        for condition,children in node.children.items()
-                    }
-                }
-            case TryNode():
-                return {
-                    'type': 'try-except',
-                    'value':  {
-                        'try': [self.build_json(child) for child in node.children['_try']],
-                        'exceptions': {
-                            exception: [self.build_json(child) for child in children]
-                            for exception, children in node.children['_except'].items()
-                        },
-                        'else': [self.build_json(child) for child in node.children['_else']],
-                        'finally': [self.build_json(child) for child in node.children['_finally']],
-                    }
-                }
-            case WithNode():
-                return {
-                    'type': 'with',
-                    'value': str(node)
-                }
-            case _:
-                raise TypeError(f"Unsupported node type '{type(node)}'")
-
-            
-    def export_tree(self,program: ProgramNode,path: str) -> None:
-        json_tree = []
+        return build_json(node)
 
-        for node in program.children:
-            json_tree.append(self.build_json(node))
+    def export_tree(self,program: ProgramNode,path: str) -> None:
+        json_tree, _ = walk(program.children, emit_graph=False)
 
+        # json.dumps encodes in one pass with the C encoder, while json.dump
+        # streams through the pure-Python iterencode
         with open(path,'w') as f:
-            dump(json_tree,f)
+            f.write(dumps(json_tree))
 
     def display_graph(self, program: ProgramNode):
+        # Plotting dependencies are heavy to import, so load them only when drawing
+        import matplotlib.pyplot as plt
+        from networkx.drawing.nx_pydot import graphviz_layout
+
         graph = build_graph(program)
         pos = graphviz_layout(graph, prog="dot")
         labels = nx.get_node_attributes(graph, 'label')
@@ -1,124 +1,177 @@
 import networkx as nx
-from typing import List
+from typing import List, Optional, Tuple
 from .nodes import LogicalNode, InstructionNode, LoopNode,BranchNode,WithNode,TryNode,ProgramNode
 
 def build_graph(program: ProgramNode) -> nx.DiGraph:
-    graph = nx.DiGraph()
+    return _build_graph(program.children)
+
+def walk(nodes: List[LogicalNode], emit_json: bool = True, emit_graph: bool = True) -> Tuple[Optional[list], Optional[nx.DiGraph]]:
+    """
+    Produce the JSON export and/or the flow graph of a scope.
+
+    Each output is built by its own pass, so requesting only one costs nothing
+    for the other.
+
+    :param nodes: The top-level scope to walk (usually ProgramNode.children).
+    :param emit_json: Whether to build the JSON representation of the nodes.
+    :param emit_graph: Whether to build the flow graph of the nodes.
+    :return: The JSON list and the graph, each None when not requested.
+    """
+    json_tree = [build_json(node) for node in nodes] if emit_json else None
+    graph = _build_graph(nodes) if emit_graph else None
+    return json_tree, graph
+
+def _build_graph(nodes: List[LogicalNode]) -> nx.DiGraph:
+    # Nodes and edges are collected during the walk and added to the graph in bulk
+    nodes_buf: list[tuple[int, dict]] = []
+    edges_buf: list[tuple[int, int]] = []
+
+    def push_block(work: list, children: List[LogicalNode]):
+        # Chain each child to its previous sibling before visiting it.
+        # The label is built once here and carried along to the child's visit
+        scope_idx = {id(child): i for i, child in enumerate(children)}
+        for i, child in enumerate(children):
+            if i > 0:
+                work.append(('_edge', children[i - 1], child))
+            work.append(('_visit', child, str(child), children, scope_idx))
+
+    def add_edges_for_node(node, label: str, parent_scope, scope_idx: dict[int, int], work: list):
+        nodes_buf.append((id(node), {'label': label}))
 
-    def add_edges_for_node(node, parent_scope):
-        node_id = id(node)
-        graph.add_node(node_id, label=str(node))
-        
         # Handle different node types
         if isinstance(node, InstructionNode):
             # Link to the next node in the parent scope
-            add_next_edge(node, parent_scope)
+            add_next_edge(node, parent_scope, scope_idx)
 
         elif isinstance(node, LoopNode):
             # Connect all children in the body sequentially
-            for i, child in enumerate(node.children):
-                child_id = id(child)
-                graph.add_node(child_id, label=str(child))
-                if i > 0:
-                    graph.add_edge(id(node.children[i - 1]), child_id)
-                add_edges_for_node(child, node.children)
+            push_block(work, node.children)
             # Link the last child to the next node in parent scope
             if node.children:
-                add_next_edge(node.children[-1], parent_scope,node)
+                work.append(('_next', node.children[-1], parent_scope, scope_idx, node))
 
         elif isinstance(node, BranchNode):
             # For each condition, link nodes in the branch sequentially
             for condition, children in node.children.items():
-                for i, child in enumerate(children):
-                    child_id = id(child)
-                    graph.add_node(child_id, label=f"{condition}: {str(child)}")
-                    if i > 0:
-                        graph.add_edge(id(children[i - 1]), child_id)
-                    add_edges_for_node(child, children)
+                push_block(work, children)
                 # Link the last child of each branch to the next node in parent scope
                 if children:
-                    add_next_edge(children[-1], parent_scope,node)
+                    work.append(('_next', children[-1], parent_scope, scope_idx, node))
 
         elif isinstance(node, TryNode):
             # Add edges for 'body'
-            body = node.children['_try']
-            exceptions = node.children['_except']
-            else_body = node.children['_else']
-            finally_body = node.children['_finally']
+            body = node._try
+            exceptions = node._except
+            else_body = node._else
+            finally_body = node._finally
 
             # Handle try block
-            for i, child  in enumerate(body):
-                child_id = id(child)
-                graph.add_node(child_id, label=str(child))
-
-                if i > 0:
-                    graph.add_edge(id(body[i - 1]), child_id)
-                add_edges_for_node(child, body)
+            push_block(work, body)
 
             # Handle else block
             if else_body:
-                for i, child  in enumerate(else_body):
-                    child_id = id(child)
-                    graph.add_node(child_id, label=str(child))
-
-                    if i > 0:
-                        graph.add_edge(id(else_body[i - 1]), child_id)
-                    add_edges_for_node(child, else_body)
-                
-                graph.add_edge(id(body[-1]),id(else_body[0]))
+                push_block(work, else_body)
+                work.append(('_edge', body[-1], else_body[0]))
 
             # Handle except blocks
             for exception, except_nodes in exceptions.items():
-                for i, child in enumerate(except_nodes):
-                    child_id = id(child)
-                    graph.add_node(child_id, label=f"except {exception}: {str(child)}")
-                    if i > 0:
-                        graph.add_edge(id(except_nodes[i - 1]), child_id)
-                    add_edges_for_node(child, except_nodes)
-            
+                push_block(work, except_nodes)
 
             # Handle finally block
             if finally_body:
-                for i, child in enumerate(finally_body):
-                    child_id = id(child)
-                    graph.add_node(child_id, label=f"finally: {str(child)}")
-                    if i > 0:
-                        graph.add_edge(id(finally_body[i - 1]), child_id)
-                    add_edges_for_node(child, finally_body)
-                add_next_edge(finally_body[-1], parent_scope,node)
+                push_block(work, finally_body)
+
+                work.append(('_next', finally_body[-1], parent_scope, scope_idx, node))
 
                 if else_body:
-                    graph.add_edge(id(else_body[-1]), id(finally_body[0]))
+                    work.append(('_edge', else_body[-1], finally_body[0]))
                 else:
-                    graph.add_edge(id(body[-1]), id(finally_body[0]))
+                    work.append(('_edge', body[-1], finally_body[0]))
 
                 if len(exceptions) > 0:
                     for except_nodes in exceptions.values():
-                        graph.add_edge(id(except_nodes[-1]),id(finally_body[0]))
+                        work.append(('_edge', except_nodes[-1], finally_body[0]))
 
         elif isinstance(node, WithNode):
             # Connect all children in the with body sequentially
-            for i, child in enumerate(node.children):
-                child_id = id(child)
-                graph.add_node(child_id, label=str(child))
-                if i > 0:
-                    graph.add_edge(id(node.children[i - 1]), child_id)
-                add_edges_for_node(child, node.children)
+            push_block(work, node.children)
             # Link the last child to the next node in parent scope
             if node.children:
+                work.append(('_next', node.children[-1], parent_scope, scope_idx, None))
 
-                add_next_edge(node.children[-1], parent_scope)
-
-    def add_next_edge(node: LogicalNode, parent_scope: List[LogicalNode],parent_node: LogicalNode = None):
+    def add_next_edge(node: LogicalNode, parent_scope: List[LogicalNode], scope_idx: dict[int, int], parent_node: LogicalNode = None):
         # Find the next node in the parent scope and link to it
         if parent_scope:
-            node_index = parent_scope.index(node) if parent_node is None else parent_scope.index(parent_node)
+            node_index = scope_idx[id(node if parent_node is None else parent_node)]
             if node_index + 1 < len(parent_scope):
                 next_node = parent_scope[node_index + 1]
-                graph.add_edge(id(node), id(next_node))
-
-    # Start with the ProgramNode and its nodes
-    for node in program.children:
-        add_edges_for_node(node, program.children)
+                edges_buf.append((id(node), id(next_node)))
+
+    # Start with the top-level nodes. Work items are kept on an explicit stack
+    # (pushed in reverse) so they run in the same order as a recursive walk
+    top_idx = {id(node): i for i, node in enumerate(nodes)}
+    stack = [('_visit', node, str(node), nodes, top_idx) for node in reversed(nodes)]
+
+    while stack:
+        item = stack.pop()
+        match item[0]:
+            case '_visit':
+                work = []
+                add_edges_for_node(item[1], item[2], item[3], item[4], work)
+                stack.extend(reversed(work))
+            case '_edge':
+                edges_buf.append((id(item[1]), id(item[2])))
+            case '_next':
+                add_next_edge(item[1], item[2], item[3], item[4])
 
+    graph = nx.DiGraph()
+    graph.add_nodes_from(nodes_buf)
+    graph.add_edges_from(edges_buf)
     return graph
+
+def build_json(node: LogicalNode) -> dict:
+    """
+    Build the JSON representation of a node and its subtree.
+
+    Plain recursion is enough here: ast.parse rejects nesting past ~100 levels,
+    far below the recursion limit.
+    """
+    match node:
+        case InstructionNode():
+            return {
+                'type': 'instruction',
+                'value': node.key
+            }
+        case LoopNode():
+            return {
+                'type': 'loop',
+                'value': {node.key : [build_json(child) for child in node.children]}
+            }
+        case BranchNode():
+            branches = {}
+            for condition, children in node.children.items():
+                branches[condition] = [build_json(child) for child in children]
+            return {
+                'type': 'branch',
+                'value': branches
+            }
+        case TryNode():
+            exceptions = {}
+            for exception, children in node._except.items():
+                exceptions[exception] = [build_json(child) for child in children]
+            return {
+                'type': 'try-except',
+                'value':  {
+                    'try': [build_json(child) for child in node._try],
+                    'exceptions': exceptions,
+                    'else': [build_json(child) for child in node._else],
+                    'finally': [build_json(child) for child in node._finally],
+                }
+            }
+        case WithNode():
+            return {
+                'type': 'with',
+                'value': str(node)
+            }
+        case _:
+            raise TypeError(f"Unsupported node type '{type(node)}'")
@@ -1,15 +1,33 @@
-from typing import Optional,List,Literal,TypedDict,Any
-from collections import OrderedDict
-from uuid import uuid4
-from pydantic import BaseModel, UUID4, NonNegativeInt
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from itertools import count
 from pathlib import Path
+import os
+import sys
 
-class TreeNode(BaseModel):
-     id: UUID4
+if TYPE_CHECKING:
+    from typing import Optional,List,Literal,Iterator,Tuple
+
+# Integer tags for the LogicalNode kinds, exposed on each class as `_kind` so
+# visitors can dispatch on a small int instead of the node's type or name
+KIND_INSTRUCTION = 0
+KIND_LOOP = 1
+KIND_BRANCH = 2
+KIND_TRY = 3
+KIND_WITH = 4
+
+# Cheap unique ids for tree nodes; they are only used to tell nodes apart in reprs
+_ID_COUNTER = count()
+
+class TreeNode:
+     __slots__ = ('id', 'children')
+
+     id: int
      children: List['TreeNode']
 
      def __init__(self):
-         super().__init__(id = uuid4(), children=[])
+         self.id = next(_ID_COUNTER)
+         self.children = []
 
      def __iter__(self):
          return iter(self.children)
@@ -20,118 +38,145 @@ class TreeNode(BaseModel):
      def add_child(self, node: 'TreeNode') -> None:
          self.children.append(node)
      
+# Filesystem nodes keep their path as a plain interned str; wrap it in a Path only
+# where path operations are actually needed
 class DirectoryNode(TreeNode):
-    path: Path
+    __slots__ = ('path',)
 
-    def __init__(self,path: Path):
-        self.path = path
+    path: str
+
+    def __init__(self,path: str | Path):
         super().__init__()
+        self.path = sys.intern(os.fspath(path))
 
 class FileNode(TreeNode):
-    path: Path
+    __slots__ = ('path', 'program')
+
+    path: str
     program: 'ProgramNode'
 
-    def __init__(self,path: Path, program: 'ProgramNode'):
-        self.path = path
-        self.program = program
+    def __init__(self,path: str | Path, program: 'ProgramNode'):
         super().__init__()
+        self.path = sys.intern(os.fspath(path))
+        self.program = program
+
+class ProgramNode(TreeNode):
+    __slots__ = ()
 
-class ProgramNode(TreeNode):   
     def printProgram(self) -> None:
-        for node in self.children:
-            self._printNode(node)
-    
-    def _printNode(self, node: 'LogicalNode', depth: int = 0) -> None:
-        if isinstance(node, InstructionNode):
-            print("  " * depth + str(node))
-        
-        elif isinstance(node,BranchNode):
-            print("  " * depth + f"Branch Node:")
-            depth +=1
-            for k,children in node.children.items():
-                print("  " * depth + f"{k}:")
-                for child in children:
-                    self._printNode(child,depth+1)
-        
-        elif isinstance(node,LoopNode):
-            print("  " * depth + str(node))
-            for child in node.children:
-                self._printNode(child,depth+1)
-
-        elif isinstance(node,TryNode):
-            print("  " * depth + f"Try Node:")
-            depth +=1
-            print("  " * depth + f"body:")
-            for child in node.children['_try']:
-                self._printNode(child,depth+1)
-
-            print("  " * depth + f"excepts:")
-            depth +=1
-            for k,children in node.children['_except'].items():
-                print("  " * depth + f"{k}:")
-                for child in children:
-                    self._printNode(child,depth+1)
-
-            if node.children['_else']:
-                print("  " * depth-1 + f"else:")
-                for child in node.else_body:
-                    self._printNode(child,depth+1)
-
-            if node.children['_finally']:
-                print("  " * depth-1 + f"finally:")
-                for child in node.finally_body:
-                    self._printNode(child,depth+1)
-            
-        elif isinstance(node,WithNode):
-            print("  " * depth + str(node))
-            depth+=1
-            for child in node.children:
-                    self._printNode(child,depth+1)
-
-class TryNodeChildren(TypedDict):
-    _try: List['LogicalNode'] = []
-    _except: OrderedDict[str,List['LogicalNode']] = OrderedDict()
-    _else: List['LogicalNode'] = []
-    _finally: List['LogicalNode'] = []
-
-class LogicalNode(BaseModel):
-    key: str | None
-    lineno: NonNegativeInt
-    col_offset: NonNegativeInt
+        # Lines are collected and written to stdout in one go
+        buf: List[str] = []
+
+        # Work items are either a (node, depth) still to print or an already formatted line
+        stack: list = [(node, 0) for node in reversed(self.children)]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                buf.append(item)
+                continue
+
+            node, depth = item
+            handler = _PRINT_HANDLERS.get(type(node))
+            if handler is not None:
+                handler(node, depth, buf, stack)
+
+        if buf:
+            sys.stdout.write("\n".join(buf))
+            sys.stdout.write("\n")
+
+    def iter_preorder(self) -> Iterator[Tuple['LogicalNode', int]]:
+        """
+        Yield every node of the program with its depth, parents before their children.
+        """
+        stack = [(node, 0) for node in reversed(self.children)]
+        while stack:
+            node, depth = stack.pop()
+            yield node, depth
+            stack.extend((child, depth+1) for child in reversed(_children_of(node)))
+
+    def iter_postorder(self) -> Iterator[Tuple['LogicalNode', int]]:
+        """
+        Yield every node of the program with its depth, children before their parents.
+        """
+        stack = [(node, 0, False) for node in reversed(self.children)]
+        while stack:
+            node, depth, children_done = stack.pop()
+            if children_done:
+                yield node, depth
+                continue
+
+            stack.append((node, depth, True))
+            stack.extend((child, depth+1, False) for child in reversed(_children_of(node)))
+
+class LogicalNode:
+    __slots__ = ('lineno', 'col_offset', 'children')
+
+    # Stored in a slot by nodes with a fixed key, derived on read by BranchNode/TryNode
+    key: str | None = None
+    # Set once per subclass; see the KIND_* constants
+    _kind: int
+    _visit_name: str
+    # Class name used by __str__, kept as an interned class constant.
+    # Subclasses get theirs from __init_subclass__
+    _NAME = sys.intern('LogicalNode')
+    lineno: int
+    col_offset: int
     children: List['LogicalNode']
 
     def __init__(self, lineno: int, col_offset: int):
-        super().__init__(
-            key=None,
-            children=[],
-            lineno=lineno,
-            col_offset=col_offset
-        )
-
-    def add_children(self, *nodes):
+        self.children = []
+        self.lineno = lineno
+        self.col_offset = col_offset
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._NAME = sys.intern(cls.__name__)
+
+    def add_children_list(self, nodes: List['LogicalNode']):
         self.children.extend(nodes)
 
+    def add_children(self, *nodes: 'LogicalNode'):
+        self.add_children_list(nodes)
+
     def __str__(self) -> str:
-        return f"{self.__class__.__name__}({self.key})"
+        return f"{type(self)._NAME}({self.key})"
 
     def __repr__(self) -> str:
         return self.__str__()
 
 class InstructionNode(LogicalNode):
+    __slots__ = ('key',)
+    _kind = KIND_INSTRUCTION
+    _visit_name = 'visit_instruction'
+
     def __init__(self, instruction: str, lineno: int, col_offset: int):
         super().__init__(lineno, col_offset)
-        self.key: str = instruction
+        self.key: str = sys.intern(instruction)
 
 class LoopNode(LogicalNode):
+    __slots__ = ('key',)
+    _kind = KIND_LOOP
+    _visit_name = 'visit_loop'
+
     def __init__(self, condition: str, lineno: int, col_offset: int):
         super().__init__(lineno, col_offset)
-        self.key: str = condition
+        self.key: str = sys.intern(condition)
         
 class BranchNode(LogicalNode):
+    __slots__ = ('_key_parts',)
+    _kind = KIND_BRANCH
+    _visit_name = 'visit_branch'
+
     def __init__(self, lineno: int, col_offset: int):
         super().__init__(lineno, col_offset)
-        self.children: OrderedDict[Optional[str], List[LogicalNode]] = OrderedDict()
-        self.key = ''
+        self.children: dict[Optional[str], List[LogicalNode]] = {}
+        # Every added condition, repeats included, unlike the keys of children
+        self._key_parts: List[str] = []
+
+    @property
+    def key(self) -> str:
+        # Joined on read rather than concatenated on every add_branch
+        return ", ".join(self._key_parts)
 
     def add_branch(self, condition: Optional[str], nodes: List[LogicalNode]):
         """
@@ -140,38 +185,139 @@ class BranchNode(LogicalNode):
         :param condition: Condition as a string (None for 'else' branch)
         :param node: The LogicalNode that this condition leads to
         """
+        if condition is not None:
+            condition = sys.intern(condition)
         self.children[condition] = nodes
-        self.key += f", {condition}" if len(self.key) > 0 else condition
+        self._key_parts.append(condition)
 
 class TryNode(LogicalNode):
+    # Each section has its own slot; the inherited children list stays empty
+    __slots__ = ('_try', '_except', '_else', '_finally')
+    _kind = KIND_TRY
+    _visit_name = 'visit_try'
+
+    _try: List[LogicalNode]
+    _except: dict[str, List[LogicalNode]]
+    _else: List[LogicalNode]
+    _finally: List[LogicalNode]
+
     def __init__(self, lineno: int, col_offset: int):
         super().__init__(lineno, col_offset)
 
-        self.children: TryNodeChildren = {
-            '_try': [],
-            '_except': OrderedDict(),
-            '_else': [],
-            '_finally':  []
-        }
+        self._try = []
+        self._except = {}
+        self._else = []
+        self._finally = []
 
     def add_except(self, exception: str, nodes: List[LogicalNode]):
-        self.children['_except'][exception] = nodes
-        self._update_key()
-        
+        self._except[sys.intern(exception)] = nodes
 
-    def _update_key(self):
-        self.key = "try,"
-        self.key += ",".join(self.children['_except'].keys())
-        if len(self.children['_else']) > 0:
-            self.key += ", else"
-        if len(self.children['_finally']) > 0:
-            self.key += ", finally"
+    @property
+    def key(self) -> str:
+        # Built on read rather than rebuilt on every add_except
+        key = "try," + ",".join(self._except)
+        if len(self._else) > 0:
+            key += ", else"
+        if len(self._finally) > 0:
+            key += ", finally"
+        return key
 
     def add_nodes(self, category: Literal['try','else','finally'], nodes: List[LogicalNode]):
-        self.children[f"_{category}"].extend(nodes)
+        match category:
+            case 'try':
+                self._try.extend(nodes)
+            case 'else':
+                self._else.extend(nodes)
+            case 'finally':
+                self._finally.extend(nodes)
         
 
 class WithNode(LogicalNode):
+    __slots__ = ('key',)
+    _kind = KIND_WITH
+    _visit_name = 'visit_with'
+
     def __init__(self, context_expr: str, lineno: int, col_offset: int):
         super().__init__(lineno, col_offset)
-        self.key: str = context_expr
\ No newline at end of file
+        self.key: str = sys.intern(context_expr)
+
+# Indentation strings by depth, grown on demand so each one is built only once
+_INDENT_CACHE: List[str] = ['']
+
+def _indent(depth: int) -> str:
+    while len(_INDENT_CACHE) <= depth:
+        _INDENT_CACHE.append(_INDENT_CACHE[-1] + '  ')
+    return _INDENT_CACHE[depth]
+
+# Printing handlers for ProgramNode.printProgram. Each emits the node's own line to buf and
+# queues its body (headers and children) on the stack in reverse, so it prints in order
+
+def _print_instruction(node: InstructionNode, depth: int, buf: List[str], stack: list) -> None:
+    buf.append(_indent(depth) + str(node))
+
+def _print_branch(node: BranchNode, depth: int, buf: List[str], stack: list) -> None:
+    buf.append(_indent(depth) + f"Branch Node:")
+    depth +=1
+    body = []
+    for k,children in node.children.items():
+        body.append(_indent(depth) + f"{k}:")
+        body.extend((child, depth+1) for child in children)
+    stack.extend(reversed(body))
+
+def _print_loop(node: LoopNode, depth: int, buf: List[str], stack: list) -> None:
+    buf.append(_indent(depth) + str(node))
+    stack.extend((child, depth+1) for child in reversed(node.children))
+
+def _print_try(node: TryNode, depth: int, buf: List[str], stack: list) -> None:
+    buf.append(_indent(depth) + f"Try Node:")
+    depth +=1
+    body = [_indent(depth) + f"body:"]
+    body.extend((child, depth+1) for child in node._try)
+
+    body.append(_indent(depth) + f"excepts:")
+    depth +=1
+    for k,children in node._except.items():
+        body.append(_indent(depth) + f"{k}:")
+        body.extend((child, depth+1) for child in children)
+
+    # else/finally sit at the same level as body/excepts, with their children one level deeper
+    if node._else:
+        body.append(_indent(depth-1) + "else:")
+        body.extend((child, depth) for child in node._else)
+
+    if node._finally:
+        body.append(_indent(depth-1) + "finally:")
+        body.extend((child, depth) for child in node._finally)
+
+    stack.extend(reversed(body))
+
+def _print_with(node: WithNode, depth: int, buf: List[str], stack: list) -> None:
+    buf.append(_indent(depth) + str(node))
+    depth+=1
+    stack.extend((child, depth+1) for child in reversed(node.children))
+
+_PRINT_HANDLERS = {
+    InstructionNode: _print_instruction,
+    BranchNode: _print_branch,
+    LoopNode: _print_loop,
+    TryNode: _print_try,
+    WithNode: _print_with,
+}
+
+# Child lists by node type for the generic walkers; sections are flattened in source order
+_CHILDREN_GETTERS = {
+    InstructionNode: lambda node: [],
+    LoopNode: lambda node: node.children,
+    BranchNode: lambda node: [child for children in node.children.values() for child in children],
+    TryNode: lambda node: [
+        *node._try,
+        *(child for children in node._except.values() for child in children),
+        *node._else,
+        *node._finally,
+    ],
+    WithNode: lambda node: node.children,
+}
+
+def _children_of(node: LogicalNode) -> List[LogicalNode]:
+    getter = _CHILDREN_GETTERS.get(type(node))
+    return getter(node) if getter is not None else []